@@ -9,9 +9,15 @@ import sys
 import base64
 import time
 import json
+import hashlib
+import threading
+import functools
 from datetime import datetime
 from pathlib import Path
 
+# Reference point for --profile-startup, taken before the heavy imports below
+_IMPORT_START = time.perf_counter()
+
 # Suppress Qt session management warning
 os.environ['SESSION_MANAGER'] = ''
 
@@ -33,6 +39,119 @@ except ImportError as e:
     DEPENDENCIES_AVAILABLE = False
     print(f"Warning: Some dependencies not available: {e}")
 
+_IMPORT_END = time.perf_counter()
+
+# Optional: NumPy is only needed for near-duplicate screenshot detection,
+# so it is imported on first use rather than slowing down every start
+_numpy = None
+
+def load_numpy():
+    """Import NumPy on first use, returns the module or None if unavailable"""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            _numpy = False
+    return _numpy or None
+
+# Default folder layout: everything goes straight into the upload folder
+DEFAULT_FOLDER_LAYOUT = "{folder}"
+
+def resolve_upload_folder(layout, folder, content, when=None, digest=None):
+    """Expand a folder layout template into the folder path for one upload
+    
+    Supported placeholders: {folder}, {yyyy}, {yy}, {mm}, {dd},
+    {hash2} and {hash4} (leading hex digits of the content's SHA-1).
+    A precomputed SHA-1 hex digest may be passed to skip hashing; the
+    content is only hashed when the layout uses a hash placeholder.
+    """
+    layout = layout or DEFAULT_FOLDER_LAYOUT
+    when = when or datetime.now()
+    if not digest and '{hash' in layout:
+        digest = hashlib.sha1(content).hexdigest()
+    digest = digest or ''
+    path = layout.format(
+        folder=folder or 'uploads',
+        yyyy=when.strftime("%Y"),
+        yy=when.strftime("%y"),
+        mm=when.strftime("%m"),
+        dd=when.strftime("%d"),
+        hash2=digest[:2],
+        hash4=digest[:4],
+    )
+    # Drop empty segments so "{folder}/{yyyy}/{mm}/" and friends stay clean
+    return "/".join(part for part in path.split("/") if part)
+
+def layout_prefix(layout, folder):
+    """Fixed leading part of a folder layout, i.e. the directory all uploads share"""
+    prefix = []
+    for segment in (layout or DEFAULT_FOLDER_LAYOUT).split("/"):
+        if '{' in segment.replace('{folder}', ''):
+            break
+        prefix.append(segment.replace('{folder}', folder or 'uploads'))
+    return "/".join(part for part in "/".join(prefix).split("/") if part)
+
+def process_age():
+    """Seconds since this process was started (Linux only), or None if unknown"""
+    try:
+        with open('/proc/self/stat') as f:
+            # Fields after the command name; starttime is field 22 of the full line
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return uptime - int(fields[19]) / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return None
+
+def validate_folder_layout(layout, folder='uploads'):
+    """Check a folder layout template, returns an error message or None if valid"""
+    try:
+        path = resolve_upload_folder(layout, folder, b'', digest='0' * 40)
+    except KeyError as e:
+        return f"Unknown placeholder {{{e.args[0]}}} in folder layout: {layout}"
+    except (IndexError, ValueError, AttributeError) as e:
+        return f"Invalid folder layout {layout}: {e}"
+    if not path:
+        return f"Folder layout resolves to an empty path: {layout}"
+    if any(part in ('.', '..') for part in path.split("/")):
+        return f"Folder layout must not contain '.' or '..' segments: {layout}"
+    return None
+
+def dhash_image(image):
+    """Compute a 64-bit difference hash (dHash) of a QImage or QPixmap, returns int or None
+    
+    The image is shrunk to 9x8 grayscale and each bit records whether a
+    pixel is brighter than its right neighbour.
+    """
+    np = load_numpy()
+    if np is None or image.isNull():
+        return None
+    # Cheap nearest-neighbour shrink first, then a smooth one for the final size.
+    # A pixmap is only converted to a QImage after shrinking, never at full size.
+    small = image.scaled(64, 64, Qt.IgnoreAspectRatio, Qt.FastTransformation)
+    if isinstance(small, QPixmap):
+        small = small.toImage()
+    small = small.scaled(9, 8, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+    small = small.convertToFormat(QImage.Format_Grayscale8)
+    bits = small.constBits()
+    bits.setsize(small.sizeInBytes())
+    pixels = np.frombuffer(bits, dtype=np.uint8).reshape(8, small.bytesPerLine())[:, :9]
+    diff = pixels[:, 1:] > pixels[:, :-1]
+    return int.from_bytes(np.packbits(diff).tobytes(), 'big')
+
+def image_fingerprint(image):
+    """dHash plus pixel size of a QImage or QPixmap, returns (dhash, width, height) or None"""
+    dhash = dhash_image(image)
+    if dhash is None:
+        return None
+    return (dhash, image.width(), image.height())
+
+def hamming_distance(a, b):
+    """Number of differing bits between two hashes"""
+    return bin(a ^ b).count('1')
+
 class GitHubUploader:
     """Handle GitHub API operations for file uploads"""
     
@@ -44,57 +163,135 @@ class GitHubUploader:
             'Authorization': f'token {token}',
             'Accept': 'application/vnd.github.v3+json'
         }
+        # Shared session so the TLS connection is reused between requests.
+        # requests.Session is not thread-safe, so every use holds the lock.
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self._session_lock = threading.Lock()
+        self._last_warmup = 0
+    
+    def warm_connection(self, min_interval=30):
+        """Open a connection to the API ahead of an upload (runs in background)"""
+        now = time.monotonic()
+        if now - self._last_warmup < min_interval:
+            return
+        self._last_warmup = now
+        
+        def warm():
+            # An upload holding the session already has a warm connection
+            if not self._session_lock.acquire(blocking=False):
+                return
+            try:
+                self.session.head("https://api.github.com", timeout=5)
+            except Exception as e:
+                print(f"Connection warm-up failed: {e}")
+            finally:
+                self._session_lock.release()
+        
+        threading.Thread(target=warm, daemon=True).start()
+    
+    def raw_url(self, file_path, folder="uploads"):
+        """Raw URL a file will have once uploaded (known before the upload)"""
+        return f"https://raw.githubusercontent.com/{self.repo}/{self.branch}/{folder}/{file_path}"
     
     def upload_file(self, file_path, content, folder="uploads"):
         """Upload file to GitHub repository"""
-        url = f"https://api.github.com/repos/{self.repo}/contents/{folder}/{file_path}"
+        with self._session_lock:
+            url = f"https://api.github.com/repos/{self.repo}/contents/{folder}/{file_path}"
         
-        # Check if file already exists
-        try:
-            response = requests.get(url, headers=self.headers)
-            if response.status_code == 200:
-                sha = response.json()['sha']
-            else:
+            # Check if file already exists
+            try:
+                response = self.session.get(url)
+                if response.status_code == 200:
+                    sha = response.json()['sha']
+                else:
+                    sha = None
+            except:
                 sha = None
-        except:
-            sha = None
-        
-        # Prepare data for upload
-        data = {
-            "message": f"Upload {file_path}",
-            "content": base64.b64encode(content).decode('utf-8'),
-            "branch": self.branch
-        }
         
-        if sha:
-            data["sha"] = sha
+            # Prepare data for upload
+            data = {
+                "message": f"Upload {file_path}",
+                "content": base64.b64encode(content).decode('utf-8'),
+                "branch": self.branch
+            }
         
-        # Upload file
-        response = requests.put(url, headers=self.headers, json=data)
+            if sha:
+                data["sha"] = sha
         
-        if response.status_code in [200, 201]:
-            return f"https://raw.githubusercontent.com/{self.repo}/{self.branch}/{folder}/{file_path}"
-        else:
-            raise Exception(f"Upload failed: {response.status_code} - {response.text}")
+            # Upload file
+            response = self.session.put(url, json=data)
+        
+            if response.status_code in [200, 201]:
+                return self.raw_url(file_path, folder)
+            else:
+                raise Exception(f"Upload failed: {response.status_code} - {response.text}")
+    
+    def get_shard_counts(self, folder="uploads"):
+        """Count files per directory below folder ('' for the whole repo), returns {directory: count}"""
+        url = f"https://api.github.com/repos/{self.repo}/git/trees/{self.branch}?recursive=1"
+        with self._session_lock:
+            response = self.session.get(url)
+        if response.status_code != 200:
+            raise Exception(f"Tree listing failed: {response.status_code} - {response.text}")
+        
+        tree = response.json()
+        prefix = folder.strip('/') + '/' if folder.strip('/') else ''
+        counts = {}
+        for item in tree.get('tree', []):
+            if item.get('type') != 'blob' or not item['path'].startswith(prefix):
+                continue
+            directory = item['path'].rsplit('/', 1)[0] if '/' in item['path'] else '.'
+            counts[directory] = counts.get(directory, 0) + 1
+        
+        if tree.get('truncated'):
+            print("Warning: tree listing was truncated by GitHub, counts are incomplete")
+        return counts
 
 class UploadWorker(QThread):
     """Worker thread for file uploads"""
-    finished = pyqtSignal(str)  # URL
+    uploaded = pyqtSignal(str)  # URL
     error = pyqtSignal(str)     # Error message
     
-    def __init__(self, uploader, file_path, content):
+    def __init__(self, uploader, file_path, content, folder="uploads"):
         super().__init__()
         self.uploader = uploader
         self.file_path = file_path
         self.content = content
+        self.folder = folder
     
     def run(self):
         try:
-            url = self.uploader.upload_file(self.file_path, self.content)
-            self.finished.emit(url)
+            url = self.uploader.upload_file(self.file_path, self.content, self.folder)
+            self.uploaded.emit(url)
         except Exception as e:
             self.error.emit(str(e))
 
+class EncodeWorker(QThread):
+    """Worker thread that PNG-encodes and hashes a clipboard image ahead of time"""
+    encoded = pyqtSignal(int, object, str, object)  # generation, PNG bytes, SHA-1 hex digest, fingerprint
+    
+    def __init__(self, generation, image, current_generation, compute_fingerprint=False):
+        super().__init__()
+        self.generation = generation
+        self.image = image
+        self.current_generation = current_generation  # callable, for skipping stale work
+        self.compute_fingerprint = compute_fingerprint
+    
+    def run(self):
+        from PyQt5.QtCore import QBuffer, QIODevice
+        image, self.image = self.image, None
+        if self.generation != self.current_generation():
+            return
+        buffer = QBuffer()
+        buffer.open(QIODevice.WriteOnly)
+        image.save(buffer, 'PNG')
+        content = buffer.data().data()
+        if self.generation != self.current_generation():
+            return
+        fingerprint = image_fingerprint(image) if self.compute_fingerprint else None
+        self.encoded.emit(self.generation, content, hashlib.sha1(content).hexdigest(), fingerprint)
+
 class SettingsDialog(QDialog):
     """Settings dialog for GitHub configuration"""
     
@@ -122,6 +319,10 @@ class SettingsDialog(QDialog):
         self.folder_input = QLineEdit(self.settings.get('folder', 'uploads'))
         form_layout.addRow("Upload Folder:", self.folder_input)
         
+        self.layout_input = QLineEdit(self.settings.get('layout', DEFAULT_FOLDER_LAYOUT))
+        self.layout_input.setPlaceholderText("{folder}/{yyyy}/{mm}")
+        form_layout.addRow("Folder Layout:", self.layout_input)
+        
         self.branch_input = QLineEdit(self.settings.get('branch', 'main'))
         form_layout.addRow("Branch:", self.branch_input)
         
@@ -142,9 +343,17 @@ class SettingsDialog(QDialog):
         self.setLayout(layout)
     
     def save_settings(self):
+        layout = self.layout_input.text() or DEFAULT_FOLDER_LAYOUT
+        layout_error = validate_folder_layout(layout, self.folder_input.text())
+        if layout_error:
+            QMessageBox.warning(self, "Up2Git Settings", layout_error)
+            return
+        
         self.settings['token'] = self.token_input.text()
         self.settings['repo'] = self.repo_input.text()
         self.settings['folder'] = self.folder_input.text()
+        self.settings['layout'] = layout
+        self.settings['layout_error'] = None
         self.settings['branch'] = self.branch_input.text()
         
         # Persist settings to config file
@@ -164,7 +373,13 @@ class SettingsDialog(QDialog):
             f.write(f"GITHUB_TOKEN={self.settings['token']}\n")
             f.write(f"GITHUB_REPO={self.settings['repo']}\n")
             f.write(f"UPLOAD_FOLDER={self.settings['folder']}\n")
+            f.write(f"UPLOAD_LAYOUT={self.settings['layout']}\n")
             f.write(f"BASE_BRANCH={self.settings['branch']}\n")
+            f.write(f"OPTIMISTIC_URL={'true' if self.settings.get('optimistic') else 'false'}\n")
+            f.write(f"NEAR_DUPLICATE_DETECTION={self.settings.get('near_duplicate', 'off')}\n")
+            f.write(f"NEAR_DUPLICATE_DISTANCE={self.settings.get('near_duplicate_distance', 2)}\n")
+            f.write(f"SPECULATIVE_ENCODE={'true' if self.settings.get('speculative') else 'false'}\n")
+            f.write(f"SPECULATIVE_MAX_MB={self.settings.get('speculative_max_mb', 64)}\n")
         
         print(f"Settings saved to: {config_file}")
 
@@ -173,17 +388,61 @@ class Up2GitApp:
     
     MAX_HISTORY_ITEMS = 10
     
-    def __init__(self):
-        self.app = QApplication(sys.argv)
+    def __init__(self, profile_startup=False):
+        self.profile_startup = profile_startup
+        self._startup_start = _IMPORT_START
+        self._startup_times = [("imports", _IMPORT_END - _IMPORT_START)]
+        
+        # Only what is needed to show the tray runs before it appears,
+        # the rest is deferred until the event loop is running
+        self.app = self._timed_stage("QApplication", QApplication, sys.argv)
         self.uploader = None
         self.tray_icon = None
         self.history = []
-        self.settings = self.load_settings()
-        self.load_history()
-        self.setup_github_uploader()
-        self.setup_tray()
-        self.setup_file_watcher()
-        self.setup_global_hotkey()
+        self._upload_workers = set()
+        self.settings = self._timed_stage("load_settings", self.load_settings)
+        self._timed_stage("setup_github_uploader", self.setup_github_uploader)
+        self._timed_stage("setup_tray", self.setup_tray)
+        self._time_to_tray = time.perf_counter() - self._startup_start
+        QTimer.singleShot(0, self._finish_startup)
+    
+    def _timed_stage(self, name, func, *args):
+        """Run one init stage and record how long it took"""
+        start = time.perf_counter()
+        result = func(*args)
+        self._startup_times.append((name, time.perf_counter() - start))
+        return result
+    
+    def _finish_startup(self):
+        """Run the init stages that are not needed before the tray is shown"""
+        self._timed_stage("load_history", self.load_history)
+        self._timed_stage("setup_file_watcher", self.setup_file_watcher)
+        self._timed_stage("setup_global_hotkey", self.setup_global_hotkey)
+        self._timed_stage("setup_speculative_encoding", self.setup_speculative_encoding)
+        self._timed_stage("setup_near_duplicate_detection", self.setup_near_duplicate_detection)
+        # Rebuilt here, not in aboutToShow: DBusMenu trays often don't pick up
+        # changes made to a menu that is already being shown
+        self._timed_stage("update_history_menu", self.update_history_menu)
+        if self.settings.get('layout_error'):
+            self.show_message("Settings Error", f"{self.settings['layout_error']}. Using {DEFAULT_FOLDER_LAYOUT} instead.")
+        if self.profile_startup:
+            self.print_startup_profile()
+    
+    def print_startup_profile(self):
+        """Print time spent in each init stage"""
+        total = time.perf_counter() - self._startup_start
+        # Interpreter start-up happens before any of our code runs,
+        # so derive it from the process age (resolution is ~10 ms)
+        age = process_age()
+        interpreter = max(age - total, 0) if age is not None else 0
+        
+        print("Startup profile:")
+        if age is not None:
+            print(f"  {'interpreter start':<32} {interpreter * 1000:8.1f} ms")
+        for name, seconds in self._startup_times:
+            print(f"  {name:<32} {seconds * 1000:8.1f} ms")
+        print(f"  {'time to tray':<32} {(interpreter + self._time_to_tray) * 1000:8.1f} ms")
+        print(f"  {'time to ready':<32} {(interpreter + total) * 1000:8.1f} ms")
     
     def get_history_file(self):
         """Get the path to the history file"""
@@ -202,6 +461,13 @@ class Up2GitApp:
         except Exception as e:
             print(f"Error loading history: {e}")
             self.history = []
+        
+        # Optimistic uploads still pending when the app last quit never got a result
+        stale = [entry for entry in self.history if entry.get('status') == 'pending']
+        for entry in stale:
+            entry['status'] = 'unknown'
+        if stale:
+            self.save_history()
     
     def save_history(self):
         """Save upload history to file"""
@@ -212,15 +478,22 @@ class Up2GitApp:
         except Exception as e:
             print(f"Error saving history: {e}")
     
-    def add_to_history(self, filename, url, thumbnail_data=None):
+    def add_to_history(self, filename, url, thumbnail_data=None, folder=None, status=None, fingerprint=None):
         """Add an upload to history"""
         entry = {
             'filename': filename,
             'url': url,
+            'folder': folder,
             'timestamp': datetime.now().isoformat(),
             'is_image': filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp')),
             'thumbnail': thumbnail_data  # Base64 encoded thumbnail for images
         }
+        if status:
+            entry['status'] = status  # 'pending', 'confirmed' or 'failed' for optimistic uploads
+        if fingerprint is not None:
+            # Perceptual hash and pixel size for near-duplicate detection
+            entry['dhash'] = f"{fingerprint[0]:016x}"
+            entry['size'] = [fingerprint[1], fingerprint[2]]
         
         # Add to beginning of list
         self.history.insert(0, entry)
@@ -231,6 +504,66 @@ class Up2GitApp:
         
         self.save_history()
         self.update_history_menu()
+        return entry
+    
+    def update_history_entry(self, entry, **changes):
+        """Update a history entry returned by add_to_history"""
+        entry.update(changes)
+        if entry in self.history:
+            self.save_history()
+            self.update_history_menu()
+    
+    def setup_near_duplicate_detection(self):
+        """Import NumPy after the tray is shown if near-duplicate detection is enabled"""
+        if self.settings.get('near_duplicate', 'off') == 'off':
+            return
+        if load_numpy() is None:
+            print("Warning: near-duplicate detection needs numpy, it is disabled")
+    
+    def find_near_duplicate(self, fingerprint):
+        """Find a recent upload of the same size within the configured Hamming distance
+        
+        Returns (entry, distance) or None.
+        """
+        dhash, width, height = fingerprint
+        max_distance = self.settings.get('near_duplicate_distance', 2)
+        best = None
+        for entry in self.history:
+            if not entry.get('dhash') or entry.get('status') in ('pending', 'failed', 'unknown'):
+                continue
+            # A 64-bit hash alone can match different screenshots of the same window
+            if entry.get('size') != [width, height]:
+                continue
+            distance = hamming_distance(dhash, int(entry['dhash'], 16))
+            if distance <= max_distance and (best is None or distance < best[1]):
+                best = (entry, distance)
+        return best
+    
+    def reuse_near_duplicate(self, fingerprint):
+        """Offer or reuse the URL of a near-identical recent upload, returns True if reused"""
+        mode = self.settings.get('near_duplicate', 'off')
+        if fingerprint is None or mode == 'off':
+            return False
+        match = self.find_near_duplicate(fingerprint)
+        if not match:
+            return False
+        entry, distance = match
+        
+        print(f"Near-duplicate of {entry['filename']} found (distance {distance})")
+        # Only an exact hash match is reused silently, anything else is confirmed
+        if mode == 'ask' or distance > 0:
+            answer = QMessageBox.question(
+                None, "Up2Git",
+                f"This image looks almost identical to {entry['filename']}.\n"
+                f"Reuse its URL instead of uploading again?",
+                QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes
+            )
+            if answer != QMessageBox.Yes:
+                return False
+        
+        pyperclip.copy(entry['url'])
+        self.show_message("Reused Upload", "URL of a near-identical image copied to clipboard")
+        return True
     
     def create_thumbnail(self, image_data, size=64):
         """Create a thumbnail from image data, returns base64 encoded PNG"""
@@ -255,7 +588,29 @@ class Up2GitApp:
             print(f"Error creating thumbnail: {e}")
             return None
     
-    def load_settings(self):
+    @staticmethod
+    def _env_int(name, default):
+        """Read an integer setting from the environment, falling back to default"""
+        value = os.getenv(name, '')
+        try:
+            return int(value) if value.strip() else default
+        except ValueError:
+            print(f"Warning: invalid {name}={value!r}, using {default}")
+            return default
+    
+    @staticmethod
+    def _env_choice(name, choices, default):
+        """Read a setting that must be one of choices, falling back to default"""
+        value = os.getenv(name, '').strip().lower()
+        if not value:
+            return default
+        if value not in choices:
+            print(f"Warning: invalid {name}={value!r}, expected one of {', '.join(choices)}; using {default}")
+            return default
+        return value
+    
+    @staticmethod
+    def load_settings():
         """Load settings from config file or environment variables"""
         import pathlib
         
@@ -278,11 +633,24 @@ class Up2GitApp:
             'token': os.getenv('GITHUB_TOKEN', ''),
             'repo': os.getenv('GITHUB_REPO', ''),
             'folder': os.getenv('UPLOAD_FOLDER', 'uploads'),
+            'layout': os.getenv('UPLOAD_LAYOUT', DEFAULT_FOLDER_LAYOUT),
             'branch': os.getenv('BASE_BRANCH', 'main'),
-            'hotkey': os.getenv('GLOBAL_HOTKEY', '<alt>+<shift>+u')
+            'hotkey': os.getenv('GLOBAL_HOTKEY', '<alt>+<shift>+u'),
+            'optimistic': os.getenv('OPTIMISTIC_URL', 'false').lower() in ('1', 'true', 'yes'),
+            'near_duplicate': Up2GitApp._env_choice('NEAR_DUPLICATE_DETECTION', ('off', 'ask', 'auto'), 'off'),
+            'near_duplicate_distance': Up2GitApp._env_int('NEAR_DUPLICATE_DISTANCE', 2),
+            'speculative': os.getenv('SPECULATIVE_ENCODE', 'false').lower() in ('1', 'true', 'yes'),
+            'speculative_max_mb': Up2GitApp._env_int('SPECULATIVE_MAX_MB', 64)
         }
         
-        print(f"Settings loaded: repo={settings['repo']}, folder={settings['folder']}, branch={settings['branch']}")
+        # Fall back to the flat layout rather than failing every upload later
+        settings['layout_error'] = validate_folder_layout(settings['layout'], settings['folder'])
+        if settings['layout_error']:
+            print(f"Warning: {settings['layout_error']}, using {DEFAULT_FOLDER_LAYOUT}")
+            settings['layout'] = DEFAULT_FOLDER_LAYOUT
+        
+        print(f"Settings loaded: repo={settings['repo']}, folder={settings['folder']}, "
+              f"layout={settings['layout']}, branch={settings['branch']}")
         print(f"Token loaded: {'Yes' if settings['token'] else 'No'}")
         
         return settings
@@ -305,19 +673,14 @@ class Up2GitApp:
             QMessageBox.critical(None, "Up2Git", "System tray is not available!")
             sys.exit(1)
         
-        # Create tray icon - try embedded first, then fallback
+        # Create tray icon - try cached/embedded first, then fallback
         try:
-            # Try to load icon from embedded resource
-            icon_data = self.get_embedded_icon()
-            if icon_data:
-                pixmap = QPixmap()
-                pixmap.loadFromData(icon_data)
-                icon = QIcon(pixmap)
-            else:
+            pixmap = self.get_tray_pixmap()
+            if pixmap is None:
                 # Fallback to simple colored icon
                 pixmap = QPixmap(64, 64)
                 pixmap.fill(Qt.blue)
-                icon = QIcon(pixmap)
+            icon = QIcon(pixmap)
         except Exception:
             # Final fallback
             pixmap = QPixmap(64, 64)
@@ -337,7 +700,7 @@ class Up2GitApp:
         
         self.menu.addSeparator()
         
-        # History submenu
+        # History submenu (filled in once history is loaded after startup)
         self.history_menu = self.menu.addMenu("Recent Uploads")
         self.update_history_menu()
         
@@ -371,8 +734,10 @@ class Up2GitApp:
         
         # Create a widget for the grid layout
         for i, entry in enumerate(self.history[:self.MAX_HISTORY_ITEMS]):
-            action = self.history_menu.addAction(self._create_history_icon(entry), 
-                                                  self._truncate_filename(entry['filename']))
+            label = self._truncate_filename(entry['filename'])
+            if entry.get('status') in ('pending', 'failed', 'unknown'):
+                label = f"{label} ({entry['status']})"
+            action = self.history_menu.addAction(self._create_history_icon(entry), label)
             action.setToolTip(f"{entry['filename']}\n{entry['url']}\n{entry['timestamp'][:10]}")
             # Use lambda with default argument to capture the URL correctly
             action.triggered.connect(lambda checked, url=entry['url']: self.copy_url_to_clipboard(url))
@@ -418,8 +783,42 @@ class Up2GitApp:
         self.update_history_menu()
         self.show_message("History", "Upload history cleared")
     
-    def get_embedded_icon(self):
-        """Get embedded icon data or load from file"""
+    def get_tray_pixmap(self):
+        """Get the tray icon pixmap, reusing a cached rasterized copy when possible"""
+        icon_path = self.find_icon_path()
+        if not icon_path:
+            return None
+        
+        cache_dir = Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache') / 'up2git'
+        cache_file = cache_dir / 'tray_icon.png'
+        stamp_file = cache_dir / 'tray_icon.stamp'
+        stat = os.stat(icon_path)
+        stamp = f"{icon_path}:{stat.st_mtime_ns}:{stat.st_size}"
+        
+        try:
+            if cache_file.exists() and stamp_file.read_text() == stamp:
+                pixmap = QPixmap(str(cache_file))
+                if not pixmap.isNull():
+                    return pixmap
+        except OSError:
+            pass
+        
+        # Cache miss: rasterize the source icon and store the result
+        pixmap = QPixmap()
+        with open(icon_path, 'rb') as f:
+            pixmap.loadFromData(f.read())
+        if pixmap.isNull():
+            return None
+        try:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            pixmap.save(str(cache_file), 'PNG')
+            stamp_file.write_text(stamp)
+        except OSError as e:
+            print(f"Error caching tray icon: {e}")
+        return pixmap
+    
+    def find_icon_path(self):
+        """Find the path of the application icon"""
         try:
             # Get the directory where this script is located
             script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -427,8 +826,7 @@ class Up2GitApp:
             icon_path = os.path.join(script_dir, "icons", "icon.svg")
             
             if os.path.exists(icon_path):
-                with open(icon_path, 'rb') as f:
-                    return f.read()
+                return icon_path
             else:
                 # Try alternative paths including fallbacks
                 alt_paths = [
@@ -445,10 +843,9 @@ class Up2GitApp:
                 
                 for path in alt_paths:
                     if os.path.exists(path):
-                        with open(path, 'rb') as f:
-                            return f.read()
+                        return path
         except Exception as e:
-            print(f"Error loading icon: {e}")
+            print(f"Error locating icon: {e}")
         
         return None
     
@@ -492,6 +889,78 @@ class Up2GitApp:
         print("   3. Assign Alt+Shift+U (or any key combination)")
         print("✅ File-based trigger system is ready!")
     
+    def setup_speculative_encoding(self):
+        """Pre-encode clipboard images in the background when the clipboard changes"""
+        self._clipboard_generation = 0
+        self._speculative_payload = None  # (generation, content, digest, fingerprint)
+        # At most one encode runs at a time; only the newest image waits for it
+        self._encode_worker = None
+        self._queued_image = None  # (generation, image)
+        if not self.settings.get('speculative'):
+            return
+        QApplication.clipboard().dataChanged.connect(self.on_clipboard_changed)
+        print("Speculative encoding enabled")
+    
+    def on_clipboard_changed(self):
+        """Discard stale speculative work and start encoding the new clipboard content"""
+        self._clipboard_generation += 1
+        self._speculative_payload = None
+        
+        clipboard = QApplication.clipboard()
+        if not clipboard.mimeData().hasImage():
+            return
+        image = clipboard.image()
+        if image.isNull():
+            return
+        
+        # Skip images whose raw pixels alone would exceed the memory cap
+        max_bytes = self.settings.get('speculative_max_mb', 64) * 1024 * 1024
+        if image.width() * image.height() * 4 > max_bytes:
+            print("Clipboard image too large for speculative encoding")
+            return
+        
+        if self._encode_worker is not None:
+            # Replaces (and frees) any image queued by an earlier change
+            self._queued_image = (self._clipboard_generation, image)
+        else:
+            self._start_encode_worker(self._clipboard_generation, image)
+        
+        if self.uploader:
+            self.uploader.warm_connection()
+    
+    def _start_encode_worker(self, generation, image):
+        """Start encoding one clipboard image in the background"""
+        worker = EncodeWorker(generation, image, lambda: self._clipboard_generation,
+                              self.settings.get('near_duplicate', 'off') != 'off')
+        worker.encoded.connect(self._speculative_encode_finished)
+        worker.finished.connect(self._encode_worker_done)
+        self._encode_worker = worker
+        worker.start()
+    
+    def _encode_worker_done(self):
+        """Release the finished encode thread and start the queued image, if still current"""
+        self._encode_worker.deleteLater()
+        self._encode_worker = None
+        queued, self._queued_image = self._queued_image, None
+        if queued and queued[0] == self._clipboard_generation:
+            self._start_encode_worker(*queued)
+    
+    def _speculative_encode_finished(self, generation, content, digest, fingerprint):
+        """Keep the encoded payload only if the clipboard has not changed since"""
+        max_bytes = self.settings.get('speculative_max_mb', 64) * 1024 * 1024
+        if generation != self._clipboard_generation or len(content) > max_bytes:
+            return
+        self._speculative_payload = (generation, content, digest, fingerprint)
+        print(f"Speculative payload ready: {len(content)} bytes")
+    
+    def _take_speculative_payload(self):
+        """Return (content, digest, fingerprint) for the current clipboard if pre-encoded, else None"""
+        payload = getattr(self, '_speculative_payload', None)
+        if not payload or payload[0] != self._clipboard_generation:
+            return None
+        self._speculative_payload = None
+        return payload[1:]
+    
     def upload_from_clipboard(self):
         """Upload content from clipboard"""
         print("upload_from_clipboard called")
@@ -508,22 +977,38 @@ class Up2GitApp:
         mime_data = clipboard.mimeData()
         
         # Try to get image from clipboard first
-        pixmap = clipboard.pixmap()
-        if not pixmap.isNull():
+        payload = self._take_speculative_payload()
+        pixmap = clipboard.pixmap() if payload is None else None
+        if payload is not None or not pixmap.isNull():
             print("Found image in clipboard")
-            # Convert pixmap to bytes using QBuffer
-            from PyQt5.QtCore import QBuffer, QIODevice
-            buffer = QBuffer()
-            buffer.open(QIODevice.WriteOnly)
-            pixmap.save(buffer, 'PNG')
-            content = buffer.data().data()
+            if payload is not None:
+                print("Using speculatively encoded payload")
+                content, digest, fingerprint = payload
+            else:
+                content = digest = fingerprint = None
+                if self.settings.get('near_duplicate', 'off') != 'off':
+                    start = time.perf_counter()
+                    fingerprint = image_fingerprint(pixmap)
+                    print(f"dHash computed in {(time.perf_counter() - start) * 1000:.2f} ms")
+            
+            # Check for a near-identical recent upload before encoding
+            if self.reuse_near_duplicate(fingerprint):
+                return
+            
+            if content is None:
+                # Convert pixmap to bytes using QBuffer
+                from PyQt5.QtCore import QBuffer, QIODevice
+                buffer = QBuffer()
+                buffer.open(QIODevice.WriteOnly)
+                pixmap.save(buffer, 'PNG')
+                content = buffer.data().data()
             
             # Generate filename
             timestamp = datetime.now().strftime("%y%m%d_%H%M%S")
             filename = f"screenshot_{timestamp}.png"
             
             print(f"Uploading image: {filename}")
-            self.upload_content(filename, content)
+            self.upload_content(filename, content, digest, fingerprint, from_clipboard_image=True)
         elif mime_data.hasUrls():
             # Handle files copied from file manager (e.g., Ctrl+C on a file)
             urls = mime_data.urls()
@@ -604,44 +1089,92 @@ class Up2GitApp:
             except Exception as e:
                 self.show_message("Error", f"Failed to read file: {e}")
     
-    def upload_content(self, filename, content):
+    def upload_content(self, filename, content, digest=None, fingerprint=None, from_clipboard_image=False):
         """Upload content using worker thread"""
-        folder = self.settings.get('folder', 'uploads')
-        print(f"upload_content called with filename: {filename}, content size: {len(content)}")
+        folder = resolve_upload_folder(
+            self.settings.get('layout', DEFAULT_FOLDER_LAYOUT),
+            self.settings.get('folder', 'uploads'),
+            content,
+            digest=digest
+        )
+        print(f"upload_content called with filename: {filename}, content size: {len(content)}, folder: {folder}")
         
-        # Store content info for history (after upload completes)
-        self._pending_upload = {
+        # Content info for history, handed back with this upload's result
+        pending = {
             'filename': filename,
+            'folder': folder,
             'content': content,
-            'is_image': filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp'))
+            'is_image': filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp')),
+            'optimistic': bool(self.settings.get('optimistic')),
+            'fingerprint': fingerprint
         }
         
-        # Start upload in worker thread
-        self.worker = UploadWorker(self.uploader, filename, content)
-        self.worker.finished.connect(self.upload_finished)
-        self.worker.error.connect(self.upload_error)
-        self.worker.start()
+        if pending['optimistic']:
+            # The raw URL is known up front: hand it out now, confirm it later
+            url = self.uploader.raw_url(filename, folder)
+            clipboard = QApplication.clipboard()
+            pending['url'] = url
+            if from_clipboard_image:
+                # The clipboard image is the upload itself: put the URL up first
+                # and only rebuild the image from the PNG bytes if the upload fails
+                clipboard.setText(url)
+                pending['previous_clipboard'] = ('content', None)
+            else:
+                pending['previous_clipboard'] = ('text', clipboard.text())
+                clipboard.setText(url)
+            pending['entry'] = self.add_to_history(filename, url, None, folder, status='pending', fingerprint=fingerprint)
+        
+        # Start upload in worker thread, kept alive until the thread has exited
+        worker = UploadWorker(self.uploader, filename, content, folder)
+        worker.uploaded.connect(functools.partial(self.upload_finished, pending=pending))
+        worker.error.connect(functools.partial(self.upload_error, pending=pending))
+        worker.finished.connect(functools.partial(self._upload_worker_done, worker))
+        self._upload_workers.add(worker)
+        worker.start()
         print("Upload worker started")
         
         # Show uploading message
         # self.show_message("Uploading", f"Uploading {filename}...")
     
-    def upload_finished(self, url):
+    def _upload_worker_done(self, worker):
+        """Release an upload thread once it has exited"""
+        self._upload_workers.discard(worker)
+        worker.deleteLater()
+    
+    def _restore_clipboard(self, pending):
+        """Put back what was on the clipboard before an optimistic upload"""
+        clipboard = QApplication.clipboard()
+        kind, text = pending['previous_clipboard']
+        if kind == 'content':
+            clipboard.setImage(QImage.fromData(pending['content']))
+        elif text:
+            clipboard.setText(text)
+        else:
+            clipboard.clear()
+    
+    def upload_finished(self, url, pending=None):
         """Handle successful upload"""
         print(f"upload_finished called with url: {url}")
         
         # Add to history
-        if hasattr(self, '_pending_upload') and self._pending_upload:
+        if pending:
             thumbnail = None
-            if self._pending_upload['is_image']:
-                thumbnail = self.create_thumbnail(self._pending_upload['content'])
+            if pending['is_image']:
+                thumbnail = self.create_thumbnail(pending['content'])
+            
+            if pending['optimistic']:
+                # URL is already on the clipboard, just confirm the entry
+                self.update_history_entry(pending['entry'], status='confirmed', thumbnail=thumbnail)
+                self.show_message("Upload Success", "Upload confirmed")
+                return
             
             self.add_to_history(
-                self._pending_upload['filename'],
+                pending['filename'],
                 url,
-                thumbnail
+                thumbnail,
+                pending['folder'],
+                fingerprint=pending['fingerprint']
             )
-            self._pending_upload = None
         
         # Copy URL to clipboard
         pyperclip.copy(url)
@@ -649,9 +1182,18 @@ class Up2GitApp:
         # Show notification (avoid newlines and special chars that crash notify-send)
         self.show_message("Upload Success", "URL copied to clipboard")
     
-    def upload_error(self, error):
+    def upload_error(self, error, pending=None):
         """Handle upload error"""
         print(f"upload_error called: {error}")
+        
+        if pending and pending['optimistic']:
+            self.update_history_entry(pending['entry'], status='failed')
+            # Roll back the clipboard unless the user has copied something else since
+            if QApplication.clipboard().text() == pending['url']:
+                self._restore_clipboard(pending)
+            self.show_message("Error", f"Upload failed, URL is not valid: {error}")
+            return
+        
         self.show_message("Error", f"Upload failed: {error}")
     
     def show_settings(self):
@@ -709,6 +1251,28 @@ def main():
             print(f"Error creating trigger: {e}")
             return 1
     
+    # Handle --shard-stats flag (report file counts per upload directory)
+    if '--shard-stats' in sys.argv:
+        if not DEPENDENCIES_AVAILABLE:
+            print("Error: Required dependencies not available")
+            return 1
+        settings = Up2GitApp.load_settings()
+        if not (settings['token'] and settings['repo']):
+            print("Error: GITHUB_TOKEN and GITHUB_REPO must be configured")
+            return 1
+        uploader = GitHubUploader(settings['token'], settings['repo'], settings['branch'])
+        try:
+            # Count below the part of the layout every upload shares, which
+            # is not necessarily UPLOAD_FOLDER (e.g. "{yyyy}/{mm}")
+            counts = uploader.get_shard_counts(layout_prefix(settings['layout'], settings['folder']))
+        except Exception as e:
+            print(f"Error: {e}")
+            return 1
+        for directory, count in sorted(counts.items()):
+            print(f"{count:8d}  {directory}")
+        print(f"{sum(counts.values()):8d}  total in {len(counts)} directories")
+        return 0
+    
     # Handle --help flag
     if '--help' in sys.argv or '-h' in sys.argv:
         print("Up2Git - GitHub File Uploader")
@@ -716,6 +1280,8 @@ def main():
         print("Usage:")
         print("  up2git           Start the system tray application")
         print("  up2git --trigger Trigger upload from clipboard (for keyboard shortcuts)")
+        print("  up2git --shard-stats  Show file counts per upload directory")
+        print("  up2git --profile-startup  Start and report time spent in each init stage")
         print("  up2git --help    Show this help message")
         print()
         print("Set your system keyboard shortcut to run: up2git --trigger")
@@ -729,7 +1295,7 @@ def main():
     
     # Run GUI application
     try:
-        app = Up2GitApp()
+        app = Up2GitApp(profile_startup='--profile-startup' in sys.argv)
         return app.run()
     except Exception as e:
         print(f"Error starting application: {e}")